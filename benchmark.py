@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк генерации EPUB: время и размер ежедневных файлов и годового файла для разных режимов сжатия
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from bible_common import BibleEpubExtractor, parse_days_file
+from epub_writer import parse_compression, zopfli
+from generate_daily_epubs_v3 import create_daily_epub
+from generate_full_year_epub import create_full_year_epub
+
+
+def default_compressions():
+    compressions = ['store', 'deflate:1', 'deflate:6', 'deflate:9']
+    if zopfli is not None:
+        compressions.append('zopfli')
+    return compressions
+
+
+def dir_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def bench_compression(days, extractor, compression):
+    """Генерирует выбранные дни во временную папку, возвращает (секунды, байты, дней)"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        built = 0
+        # Логирование генератора здесь не настроено, так что консольного вывода в замере нет
+        for day_name, day_data in days:
+            built += create_daily_epub(day_name, day_data, extractor, output_dir, compression=compression)
+        elapsed = time.perf_counter() - start
+        return elapsed, dir_size(output_dir), built
+
+
+def bench_full_year(days, extractor, compression):
+    """Генерирует годовой EPUB из выбранных дней во временную папку, возвращает (секунды, байты)"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        output_file = os.path.join(output_dir, 'full_year.epub')
+        start = time.perf_counter()
+        create_full_year_epub(dict(days), extractor, output_file, compression=compression)
+        elapsed = time.perf_counter() - start
+        return elapsed, os.path.getsize(output_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Размер и время генерации EPUB для режимов сжатия')
+    parser.add_argument('--source', default='.', help='Папка с распакованной книгой или файл .epub')
+    parser.add_argument('--days', type=int, default=365, help='Сколько первых дней плана генерировать')
+    parser.add_argument('--compression', action='append',
+                        help='Режим сжатия (можно несколько раз), по умолчанию все доступные')
+    args = parser.parse_args()
+
+    days = sorted(parse_days_file('days').items(), key=lambda x: x[1]['number'])[:args.days]
+
+    print(f"Дней: {len(days)}, источник: {args.source}")
+    print(f"{'сжатие':<12}{'вывод':<8}{'время, с':>10}{'мс/день':>10}{'размер, КБ':>12}")
+
+    with BibleEpubExtractor(args.source) as extractor:
+        for spec in args.compression or default_compressions():
+            compression = parse_compression(spec)
+
+            elapsed, size, built = bench_compression(days, extractor, compression)
+            per_day = elapsed / built * 1000 if built else 0
+            print(f"{spec:<12}{'дни':<8}{elapsed:>10.2f}{per_day:>10.1f}{size / 1024:>12.1f}")
+
+            elapsed, size = bench_full_year(days, extractor, compression)
+            per_day = elapsed / len(days) * 1000 if days else 0
+            print(f"{spec:<12}{'год':<8}{elapsed:>10.2f}{per_day:>10.1f}{size / 1024:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,790 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Общие части генераторов: словари книг, экстрактор глав и парсинг плана чтения
+"""
+
+import html
+import json
+import os
+import posixpath
+import re
+import zipfile
+from lxml import etree
+
+# Маппинг сокращений книг к их полным названиям (транслитерация)
+BOOK_ABBR_TO_FULL = {
+    # Ветхий Завет
+    'Быт': 'Bytie',
+    'Исх': 'Ishod',
+    'Лев': 'Levit',
+    'Чис': 'Chisla',
+    'Втор': 'Vtorozakonie',
+    'Нав': 'Iisusa Navina',
+    'Суд': 'Sudej',
+    'Руф': 'Rufi',
+    '1 Цар': 'Pervaya kniga Tsarstv',
+    '2 Цар': 'Vtoraya kniga Tsarstv',
+    '3 Цар': "Tret'ya kniga Tsarstv",
+    '4 Цар': 'Chetvyortaya kniga Tsarstv',
+    '1 Пар': 'Pervaya kniga Paralipomenon',
+    '2 Пар': 'Vtoraya kniga Paralipomenon',
+    '1 Езд': 'Pervaya kniga Ezdry',
+    '2 Езд': 'Vtoraya kniga Ezdry',
+    'Неем': 'Neemii',
+    'Тов': 'Tovita',
+    'Иудиф': 'Iudifi',
+    'Есф': 'Esfiri',
+    'Иов': 'Iova',
+    'Пс': "Psaltir'",
+    'Притч': 'Pritchi Solomona',
+    'Еккл': 'Ekkleziast',
+    'Песн': "Pesn' pesnej Solomona",
+    'Прем': 'premudrosti Solomona',
+    'Сир': 'premudrosti Iisusa',
+    'Ис': 'Isaii',
+    'Иер': 'Ieremii',
+    'Плач': 'Plach Ieremii',
+    'Посл': 'Poslanie Ieremii',
+    'Вар': 'Varuha',
+    'Иез': 'Iezekiilya',
+    'Дан': 'Daniila',
+    'Ос': 'Osii',
+    'Иоил': 'Ioilya',
+    'Ам': 'Amosa',
+    'Авд': 'Avdiya',
+    'Ион': 'Iony',
+    'Мих': 'Miheya',
+    'Наум': 'Nauma',
+    'Авв': 'Avvakuma',
+    'Соф': 'Sofonii',
+    'Агг': 'Aggeya',
+    'Зах': 'Zaharii',
+    'Мал': 'Malahii',
+    '1 Мак': 'Pervaya kniga Makkavejskaya',
+    '2 Мак': 'Vtoraya kniga Makkavejskaya',
+    '3 Мак': "Tret'ya kniga Makkavejskaya",
+    '3 Езд': "Tret'ya kniga Ezdry",
+
+    # Новый Завет
+    'Мф': 'Matfeya',
+    'Мк': 'Marka',
+    'Лк': 'Luki',
+    'Ин': 'Ioanna',
+    'Деян': 'Deyaniya',
+    'Иак': 'Iakova',
+    '1 Пет': 'Pervoe sobornoe poslanie svyatogo apostola Petra',
+    '2 Пет': 'Vtoroe sobornoe poslanie svyatogo apostola Petra',
+    '1 Ин': 'Pervoe sobornoe poslanie svyatogo apostola Ioanna',
+    '2 Ин': 'Vtoroe sobornoe poslanie svyatogo apostola Ioanna',
+    '3 Ин': "Tret'e sobornoe poslanie svyatogo apostola Ioanna",
+    'Иуд': 'Iudy',
+    'Рим': 'Rimlyanam',
+    '1 Кор': 'Pervoe poslanie k Korinfyanam',
+    '2 Кор': 'Vtoroe poslanie k Korinfyanam',
+    'Гал': 'Galatam',
+    'Еф': 'Efesyanam',
+    'Флп': 'Filippijtsam',
+    'Кол': 'Kolossyanam',
+    '1 Фес': 'Pervoe poslanie k Fessalonikijtsam',
+    '2 Фес': 'Vtoroe poslanie k Fessalonikijtsam',
+    '1 Тим': 'Pervoe poslanie k Timofeyu',
+    '2 Тим': 'Vtoroe poslanie k Timofeyu',
+    'Тит': 'Titu',
+    'Флм': 'Filimonu',
+    'Евр': 'Evreyam',
+    'Откр': 'Otkrovenie',
+}
+
+# Словарь русских названий книг для отображения
+BOOK_ABBR_TO_RU = {
+    'Быт': 'Бытие',
+    'Исх': 'Исход',
+    'Лев': 'Левит',
+    'Чис': 'Числа',
+    'Втор': 'Второзаконие',
+    'Нав': 'Иисус Навин',
+    'Суд': 'Судей',
+    'Руф': 'Руфь',
+    '1 Цар': '1 Царств',
+    '2 Цар': '2 Царств',
+    '3 Цар': '3 Царств',
+    '4 Цар': '4 Царств',
+    '1 Пар': '1 Паралипоменон',
+    '2 Пар': '2 Паралипоменон',
+    '1 Езд': '1 Ездры',
+    '2 Езд': '2 Ездры',
+    'Неем': 'Неемия',
+    'Тов': 'Товит',
+    'Иудиф': 'Иудифь',
+    'Есф': 'Есфирь',
+    'Иов': 'Иов',
+    'Пс': 'Псалтирь',
+    'Притч': 'Притчи',
+    'Еккл': 'Екклесиаст',
+    'Песн': 'Песнь Песней',
+    'Прем': 'Премудрость Соломона',
+    'Сир': 'Премудрость Сираха',
+    'Ис': 'Исаия',
+    'Иер': 'Иеремия',
+    'Плач': 'Плач Иеремии',
+    'Посл': 'Послание Иеремии',
+    'Вар': 'Варух',
+    'Иез': 'Иезекииль',
+    'Дан': 'Даниил',
+    'Ос': 'Осия',
+    'Иоил': 'Иоиль',
+    'Ам': 'Амос',
+    'Авд': 'Авдий',
+    'Ион': 'Иона',
+    'Мих': 'Михей',
+    'Наум': 'Наум',
+    'Авв': 'Аввакум',
+    'Соф': 'Софония',
+    'Агг': 'Аггей',
+    'Зах': 'Захария',
+    'Мал': 'Малахия',
+    '1 Мак': '1 Маккавейская',
+    '2 Мак': '2 Маккавейская',
+    '3 Мак': '3 Маккавейская',
+    '3 Езд': '3 Ездры',
+    'Мф': 'Евангелие от Матфея',
+    'Мк': 'Евангелие от Марка',
+    'Лк': 'Евангелие от Луки',
+    'Ин': 'Евангелие от Иоанна',
+    'Деян': 'Деяния',
+    'Иак': 'Иакова',
+    '1 Пет': '1 Петра',
+    '2 Пет': '2 Петра',
+    '1 Ин': '1 Иоанна',
+    '2 Ин': '2 Иоанна',
+    '3 Ин': '3 Иоанна',
+    'Иуд': 'Иуда',
+    'Рим': 'Римлянам',
+    '1 Кор': '1 Коринфянам',
+    '2 Кор': '2 Коринфянам',
+    'Гал': 'Галатам',
+    'Еф': 'Ефесянам',
+    'Флп': 'Филиппийцам',
+    'Кол': 'Колоссянам',
+    '1 Фес': '1 Фессалоникийцам',
+    '2 Фес': '2 Фессалоникийцам',
+    '1 Тим': '1 Тимофею',
+    '2 Тим': '2 Тимофею',
+    'Тит': 'Титу',
+    'Флм': 'Филимону',
+    'Евр': 'Евреям',
+    'Откр': 'Откровение',
+}
+
+CONTAINER_NS = '{urn:oasis:names:tc:opendocument:xmlns:container}'
+
+# Открывающий или закрывающий тег div в байтах файла; в группе 1 - атрибуты открывающего тега
+DIV_TAG = re.compile(rb'<div\b([^>]*)>|</div\s*>')
+SECTION_CLASS = re.compile(rb'\bclass="[^"]*\bsection\b[^"]*"')
+ID_ATTR = re.compile(rb'\bid="([^"]*)"')
+
+
+class BibleEpubExtractor:
+    """Экстрактор глав из исходной книги
+
+    epub_dir - папка с распакованной книгой (META-INF/, OEBPS/) или сам файл .epub.
+    Упакованная книга не распаковывается: читаются только нужные члены архива,
+    а сам архив остается открытым до close() (или выхода из блока with).
+    """
+
+    def __init__(self, epub_dir):
+        self.epub_dir = epub_dir
+        self.book_mapping = {}
+        self.chapter_index = {}
+        self._sections = {}
+        self._zip = None
+        self._members = {}
+        self._content_dir = 'OEBPS'
+        if os.path.isfile(epub_dir):
+            self._open_zip()
+        self._build_book_mapping()
+
+    def _open_zip(self):
+        """Открывает .epub и строит индекс членов архива по имени"""
+        self._zip = zipfile.ZipFile(self.epub_dir)
+        # ZipInfo хранит смещение локального заголовка, так что чтение члена - один seek
+        self._members = {info.filename: info for info in self._zip.infolist()}
+
+        # Папку с контентом берем из container.xml, а не считаем, что это всегда OEBPS
+        if 'META-INF/container.xml' not in self._members:
+            self.close()
+            raise ValueError(f"В {self.epub_dir} нет META-INF/container.xml: это не EPUB")
+        container = etree.fromstring(self._zip.read(self._members['META-INF/container.xml']))
+        rootfile = container.find(f'.//{CONTAINER_NS}rootfile')
+        self._content_dir = posixpath.dirname(rootfile.get('full-path'))
+
+    def close(self):
+        """Закрывает исходный .epub (для распакованной папки ничего не делает)"""
+        if self._zip is not None:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _has_source(self, file_name):
+        """Проверяет, есть ли файл контента (путь относительно папки OEBPS)"""
+        if self._zip is not None:
+            return posixpath.join(self._content_dir, file_name) in self._members
+        return os.path.exists(os.path.join(self.epub_dir, self._content_dir, file_name))
+
+    def _read_source(self, file_name):
+        """Читает файл контента в байты из папки или из архива"""
+        if self._zip is not None:
+            return self._zip.read(self._members[posixpath.join(self._content_dir, file_name)])
+        with open(os.path.join(self.epub_dir, self._content_dir, file_name), 'rb') as f:
+            return f.read()
+
+    def _build_book_mapping(self):
+        """Строит маппинг книг на основе toc.ncx, собирая все файлы для каждой книги
+
+        Заодно заполняет chapter_index: {книга: {номер главы: (файл, якорь)}} по пунктам Glava N / Psalom N.
+        """
+        parser = etree.XMLParser(encoding='utf-8')
+        root = etree.fromstring(self._read_source('toc.ncx'), parser)
+
+        ns = {'ncx': 'http://www.daisy.org/z3986/2005/ncx/'}
+        nav_points = root.xpath('//ncx:navPoint', namespaces=ns)
+
+        current_book = None
+        # navPoint текущей книги, если в нем есть пункты глав: вложенные в него прочие пункты - часть книги
+        book_point = None
+
+        for nav_point in nav_points:
+            label = nav_point.xpath('.//ncx:text', namespaces=ns)
+            if not label:
+                continue
+
+            label_text = label[0].text
+            content = nav_point.xpath('.//ncx:content', namespaces=ns)
+            if not content:
+                continue
+
+            src = content[0].get('src')
+            file_name = src.split('#')[0]
+
+            is_chapter = label_text.startswith('Glava ') or label_text.startswith('Psalom ')
+
+            # Сохраняем названия книг и привязываем к ним все файлы глав.
+            # Пункт внутри navPoint книги с главами (например, "Predislovie" у Сираха) - часть этой книги.
+            # Раздел вроде "Pyatiknizhie Moiseya" глав не содержит, поэтому вложенные в него книги - новые книги,
+            # как и любые пункты оглавления без глав Glava/Psalom
+            if not is_chapter and (book_point is None or book_point not in nav_point.iterancestors()):
+                current_book = label_text
+                book_point = nav_point if nav_point.xpath(
+                    'ncx:navPoint/ncx:navLabel/ncx:text[starts-with(., "Glava ") or starts-with(., "Psalom ")]',
+                    namespaces=ns) else None
+                if current_book not in self.book_mapping:
+                    self.book_mapping[current_book] = []
+                    self.chapter_index[current_book] = {}
+
+            # Добавляем файл к текущей книге, если его там еще нет
+            if current_book and file_name not in self.book_mapping[current_book]:
+                self.book_mapping[current_book].append(file_name)
+
+            if current_book and is_chapter:
+                chapter_num = label_text.split()[1]
+                if chapter_num.isdigit():
+                    self.chapter_index[current_book][int(chapter_num)] = (file_name, src.partition('#')[2])
+
+    def find_book(self, book_search):
+        """Находит книгу в маппинге по подстроке ее названия из toc.ncx"""
+        for book_name in self.book_mapping.keys():
+            if book_search.lower() in book_name.lower():
+                return book_name
+        return None
+
+    def extract_chapter(self, book_name, chapter_num):
+        """Извлекает главу: по chapter_index, а для книг без пунктов глав в оглавлении - по тексту 'Глава N'"""
+        if book_name not in self.book_mapping:
+            return None, f"Книга не найдена: {book_name}"
+
+        # Номер главы сразу ведет к файлу и секции из toc.ncx, без перебора файлов по заголовкам.
+        # Поиск по тексту остается для книг, чье оглавление не размечено главами (как и в check_plan)
+        if self.chapter_index.get(book_name):
+            return self._extract_indexed_section(book_name, chapter_num)
+
+        return self._extract_by_headings(book_name, [chapter_num])[chapter_num]
+
+    def _extract_by_headings(self, book_name, chapter_nums):
+        """Ищет главы книги по тексту 'Глава N' / 'Псалом N', разбирая каждый файл книги один раз на все главы
+
+        Возвращает {номер главы: (секция главы или None, ошибка или None)}.
+        """
+        book_files = self.book_mapping[book_name]
+        found = {}
+        remaining = list(dict.fromkeys(chapter_nums))
+
+        # Проходимся по всем файлам этой книги, пока не найдены все главы
+        for book_file in book_files:
+            if not remaining:
+                break
+            if not self._has_source(book_file):
+                continue
+
+            try:
+                parser = etree.HTMLParser(encoding='utf-8')
+                root = etree.fromstring(self._read_source(book_file), parser)
+            except Exception:
+                continue  # Игнорируем ошибки парсинга конкретного файла
+
+            for chapter_num in list(remaining):
+                section = self._find_heading_section(root, chapter_num)
+                if section is not None:
+                    found[chapter_num] = (section, None)
+                    remaining.remove(chapter_num)
+
+        for chapter_num in remaining:
+            found[chapter_num] = (None, f"Глава {chapter_num} не найдена в файлах книги ({len(book_files)} шт.)")
+        return found
+
+    def _find_heading_section(self, root, chapter_num):
+        """Секция, в которой написан заголовок 'Глава N' или 'Псалом N', или None"""
+        search_text = f"Глава {chapter_num}"
+        search_psalom = f"Псалом {chapter_num}"
+
+        # Ищем <p> (или любой другой тег), внутри которого написан текст "Глава 20" или "Псалом 20"
+        nodes = root.xpath(f'//*[contains(text(), "{search_text}") or contains(text(), "{search_psalom}")]')
+        if not nodes:
+            return None
+
+        node = nodes[0]
+        # Нам нужно подняться вверх по дереву и найти главный <div class="section">,
+        # внутри которого лежит эта глава.
+        parent_sections = node.xpath('ancestor::div[contains(@class, "section")]')
+        if parent_sections:
+            return parent_sections[0]
+
+        # Если вдруг class="section" нет, берем ближайший родительский div
+        parent_divs = node.xpath('ancestor::div[1]')
+        return parent_divs[0] if parent_divs else None
+
+    def extract_chapters(self, needs):
+        """Извлекает много глав, читая каждый исходный файл один раз
+
+        needs - [(ключ, книга, номер главы)]. Главы из chapter_index идут группами по файлам,
+        и файл освобождается после своей группы; главы книг без индекса ищутся по заголовкам
+        за один проход по файлам книги. Генератор (ключ, секция главы или None, ошибка или None).
+        """
+        # Файлы в порядке первой встречи; None - главы, которых нет в индексе своей книги
+        groups = {}
+        heading_scan = {}
+        for key, book_name, chapter_num in needs:
+            if self.chapter_index.get(book_name):
+                entry = self.chapter_index[book_name].get(chapter_num)
+                groups.setdefault(entry[0] if entry else None, []).append((key, book_name, chapter_num))
+            else:
+                heading_scan.setdefault(book_name, []).append((key, chapter_num))
+
+        for file_name, file_needs in groups.items():
+            for key, book_name, chapter_num in file_needs:
+                yield (key, *self._extract_indexed_section(book_name, chapter_num))
+            if file_name is not None:
+                self.release_source(file_name)
+
+        for book_name, book_needs in heading_scan.items():
+            found = self._extract_by_headings(book_name, [chapter_num for _, chapter_num in book_needs])
+            for key, chapter_num in book_needs:
+                yield (key, *found[chapter_num])
+
+    def _extract_indexed_section(self, book_name, chapter_num):
+        """Извлекает главу по записи chapter_index: (файл, якорь секции)"""
+        entry = self.chapter_index[book_name].get(chapter_num)
+        if entry is None:
+            return None, f"Глава {chapter_num} не найдена в оглавлении книги"
+
+        file_name, anchor = entry
+        if not self._has_source(file_name):
+            return None, f"Файл главы {chapter_num} не найден: {file_name}"
+
+        # Обычный случай: якорь стоит на самой секции главы, разбираем только ее байты
+        data, sections = self._section_offsets(file_name)
+        if anchor in sections:
+            start, end = sections[anchor]
+            root = etree.fromstring(data[start:end], etree.HTMLParser(encoding='utf-8'))
+            section = root.find('body')[0]
+            # Текст после секции до следующего тега (или до конца файла), как у элемента из полного дерева файла
+            tail_end = data.find(b'<', end)
+            section.tail = data[end:tail_end if tail_end != -1 else len(data)].decode('utf-8') or None
+            return section, None
+
+        parser = etree.HTMLParser(encoding='utf-8')
+        root = etree.fromstring(data, parser)
+
+        # Без якоря глава занимает весь файл (Псалом 118): секции нет, оборачиваем содержимое body
+        if not anchor:
+            section = etree.Element('div', {'class': 'section'})
+            section.extend(list(root.find('body')))
+            return section, None
+
+        nodes = root.xpath('//*[@id=$anchor]', anchor=anchor)
+        if not nodes:
+            return None, f"Якорь {anchor} главы {chapter_num} не найден в {file_name}"
+
+        # Якорь может стоять и на заголовке внутри секции с несколькими псалмами - берем ближайшую секцию
+        sections = nodes[0].xpath('ancestor-or-self::div[contains(@class, "section")]')
+        return (sections[-1] if sections else nodes[0]), None
+
+    def release_source(self, file_name):
+        """Забывает байты и границы секций файла, когда все нужные главы из него уже извлечены"""
+        self._sections.pop(file_name, None)
+
+    def _section_offsets(self, file_name):
+        """Байты файла и границы его секций: (данные, {id секции: (начало, конец)})
+
+        Файл один раз просматривается по тегам div без построения дерева, с учетом вложенности
+        (секция книги в общем файле содержит секции глав). Результат кэшируется, так что
+        любая следующая глава этого файла - это разбор только ее среза.
+        """
+        if file_name in self._sections:
+            return self._sections[file_name]
+
+        data = self._read_source(file_name)
+        offsets = {}
+        open_divs = []  # стек (id секции или None, начало тега)
+
+        for match in DIV_TAG.finditer(data):
+            attrs = match.group(1)
+            if attrs is None:
+                if open_divs:
+                    section_id, start = open_divs.pop()
+                    if section_id is not None:
+                        offsets[section_id] = (start, match.end())
+            elif not attrs.endswith(b'/'):
+                id_match = ID_ATTR.search(attrs) if SECTION_CLASS.search(attrs) else None
+                open_divs.append((id_match.group(1).decode('utf-8') if id_match else None, match.start()))
+
+        self._sections[file_name] = (data, offsets)
+        return data, offsets
+
+
+def parse_days_file(filepath):
+    """Парсит файл days и возвращает словарь с планом чтения"""
+    days = {}
+    current_day = None
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            if line.startswith('День '):
+                current_day = line
+                days[current_day] = {'number': None, 'chapters': []}
+            elif current_day and line.isdigit():
+                days[current_day]['number'] = int(line)
+            elif current_day:
+                days[current_day]['chapters'].append(line)
+
+    return days
+
+
+def parse_chapter_reference(ref):
+    """Извлекает только название книги и первое число (главу), игнорируя диапазоны и стихи"""
+    ref = ref.strip()
+    # Ищет книгу (буквы/цифры до точки) и первую группу цифр после неё
+    pattern = r'^([\dА-Яа-я\s]+)\.\s*(\d+)'
+    match = re.search(pattern, ref)
+
+    if match:
+        book = match.group(1).strip()
+        chapter_num = int(match.group(2))
+        return (book, chapter_num)
+
+    return None
+
+
+def resolve_books(extractor, book_titles=None):
+    """Сокращение плана -> книга в маппинге экстрактора для всех сокращений, чья книга нашлась
+
+    Сокращения нет в book_titles - ошибка unknown_abbreviation, есть, но нет в результате - book_not_found.
+    """
+    book_titles = book_titles or BOOK_ABBR_TO_FULL
+    books = {}
+    for book_abbr, book_search in book_titles.items():
+        matched_book = extractor.find_book(book_search)
+        if matched_book:
+            books[book_abbr] = matched_book
+    return books
+
+
+def check_plan(days, extractor, book_titles=None):
+    """Проверяет все ссылки плана по индексу глав, ничего не извлекая и не рендеря
+
+    Каждое сокращение и каждая пара (книга, глава) разрешаются один раз, дальше - поиск в словарях.
+    Возвращает отчет для JSON: общие счетчики, счетчики по категориям и список всех ошибок.
+    """
+    book_titles = book_titles or BOOK_ABBR_TO_FULL
+    books = resolve_books(extractor, book_titles)
+    failures = []
+    references = 0
+    heading_scan = {}
+
+    for day_name, day_data in sorted(days.items(), key=lambda x: x[1]['number'] or 0):
+        for chapter_ref in day_data['chapters']:
+            references += 1
+            failure = {'day': day_data['number'], 'day_name': day_name, 'ref': chapter_ref}
+
+            parsed = parse_chapter_reference(chapter_ref)
+            if not parsed:
+                failures.append(dict(failure, error='unparsed_reference'))
+                continue
+
+            book_abbr, chapter_num = parsed
+            failure.update(book_abbr=book_abbr, chapter=chapter_num)
+
+            if book_abbr not in book_titles:
+                failures.append(dict(failure, error='unknown_abbreviation'))
+                continue
+
+            matched_book = books.get(book_abbr)
+            if not matched_book:
+                failures.append(dict(failure, error='book_not_found', book_search=book_titles[book_abbr]))
+                continue
+
+            # Книги без пунктов глав в оглавлении экстрактор ищет по заголовкам в тексте: по индексу их не проверить
+            if not extractor.chapter_index.get(matched_book):
+                heading_scan[matched_book] = heading_scan.get(matched_book, 0) + 1
+                continue
+
+            if chapter_num not in extractor.chapter_index[matched_book]:
+                failures.append(dict(failure, error='chapter_not_found', book=matched_book))
+
+    by_error = {}
+    for failure in failures:
+        by_error[failure['error']] = by_error.get(failure['error'], 0) + 1
+
+    return {
+        'ok': not failures,
+        'days': len(days),
+        'references': references,
+        'failed': len(failures),
+        'unchecked': sum(heading_scan.values()),
+        'heading_scan_books': dict(sorted(heading_scan.items())),
+        'by_error': by_error,
+        'failures': failures,
+    }
+
+
+def add_check_args(parser):
+    """Аргумент --check, общий для обоих генераторов"""
+    parser.add_argument('--check', action='store_true',
+                        help='Только проверить план по индексу глав и вывести отчет JSON, без генерации EPUB')
+
+
+def run_check(args, epub_dir, days_file):
+    """Режим --check: печатает отчет JSON и возвращает код выхода (1, если есть ошибки)"""
+    days = parse_days_file(days_file)
+    if args.translation:
+        translations = [parse_translation_arg(spec) for spec in args.translation]
+        report = {t.name: check_plan(days, t.extractor, t.book_titles) for t in translations}
+        ok = all(r['ok'] for r in report.values())
+        for translation in translations:
+            translation.extractor.close()
+    else:
+        with BibleEpubExtractor(epub_dir) as extractor:
+            report = check_plan(days, extractor)
+        ok = report['ok']
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if ok else 1
+
+
+class PlanChapters:
+    """Все главы плана, извлеченные заранее и сгруппированные по исходным файлам
+
+    Нужные пары (книга, глава) собираются по всему плану, каждый исходный файл читается
+    и разбирается один раз подряд для всех своих глав, а день потом собирается поиском
+    по словарю готовых фрагментов - как и с ParallelBible.
+    """
+
+    def __init__(self, extractor, days, book_titles=None):
+        self.extractor = extractor
+        self.book_titles = book_titles or BOOK_ABBR_TO_FULL
+        self.fragments = {}
+        self.errors = {}
+
+        books = resolve_books(extractor, self.book_titles)
+        needs = []
+        for day_data in days.values():
+            for chapter_ref in day_data['chapters']:
+                parsed = parse_chapter_reference(chapter_ref)
+                if not parsed or parsed in self.fragments or parsed in self.errors:
+                    continue
+
+                book_abbr, chapter_num = parsed
+                if book_abbr not in self.book_titles:
+                    self.errors[parsed] = ('unknown_abbreviation', f"Сокращение не найдено: {book_abbr}")
+                elif book_abbr not in books:
+                    self.errors[parsed] = ('book_not_found', f"Книга не найдена: {self.book_titles[book_abbr]} "
+                                                             f"(сокращение: {book_abbr})")
+                else:
+                    # Ставим заглушку, чтобы повторная ссылка на ту же главу не попала в needs еще раз
+                    self.fragments[parsed] = None
+                    needs.append((parsed, books[book_abbr], chapter_num))
+
+        for key, chapter_div, error in extractor.extract_chapters(needs):
+            if error:
+                self.errors[key] = ('chapter_not_found', error)
+            if chapter_div is not None:
+                self.fragments[key] = etree.tostring(chapter_div, encoding='utf-8', method='xml',
+                                                     xml_declaration=False)
+
+    def chapter(self, book_abbr, chapter_num):
+        """Возвращает (html главы в bytes или None, (категория, сообщение) ошибки или None)"""
+        key = (book_abbr, chapter_num)
+        return self.fragments.get(key), self.errors.get(key)
+
+
+def split_verses(chapter_div):
+    """Разбивает блок главы на стихи: {номер стиха: html его абзацев}
+
+    Абзацы до первого номерованного стиха (надписания псалмов и т.п.) попадают в стих 0.
+    """
+    verses = {}
+    current = 0
+
+    for p in chapter_div.iter('p'):
+        # Заголовок "Глава N" выводим сами, в стихи он не входит
+        if 'title-p' in (p.get('class') or ''):
+            continue
+
+        # Номер стиха лежит в ведущем <em>: <p class="p"><em>3</em> ...</p>
+        if len(p) and p[0].tag == 'em' and not (p.text or '').strip():
+            num_text = (p[0].text or '').strip()
+            if num_text.isdigit():
+                current = int(num_text)
+
+        p_html = etree.tostring(p, encoding='unicode', method='xml', with_tail=False)
+        verses.setdefault(current, []).append(p_html)
+
+    return {num: ''.join(parts) for num, parts in verses.items()}
+
+
+class Translation:
+    """Один исходный перевод: экстрактор и сопоставление сокращений плана книгам его toc.ncx"""
+
+    def __init__(self, name, epub_dir, book_titles=None):
+        self.name = name
+        self.extractor = BibleEpubExtractor(epub_dir)
+        self.book_titles = book_titles or BOOK_ABBR_TO_FULL
+
+        # Сокращение -> книга в маппинге экстрактора, ищем один раз, а не на каждую ссылку
+        self.books = resolve_books(self.extractor, self.book_titles)
+
+
+def parse_translation_arg(spec):
+    """Разбирает аргумент вида 'Имя=путь[,названия.json]' в Translation
+
+    Путь - папка с распакованной книгой или файл .epub.
+    JSON с названиями нужен для изданий, у которых toc.ncx отличается от bibliya.epub:
+    это словарь {сокращение из плана: подстрока названия книги в toc.ncx}.
+    """
+    if '=' not in spec:
+        raise ValueError(f"Ожидается 'Имя=путь[,названия.json]': {spec}")
+
+    name, rest = spec.split('=', 1)
+    epub_dir, _, titles_path = rest.partition(',')
+
+    book_titles = None
+    if titles_path:
+        with open(titles_path, 'r', encoding='utf-8') as f:
+            book_titles = json.load(f)
+
+    return Translation(name.strip(), epub_dir.strip(), book_titles)
+
+
+class ParallelBible:
+    """Несколько переводов, выровненных по (книга, глава, стих)
+
+    Выравнивание и html фрагментов считаются один раз при индексации для всех глав плана,
+    поэтому при рендеринге дня остается только поиск по словарю, как и для одного перевода.
+    """
+
+    LAYOUTS = ('columns', 'interleaved')
+
+    def __init__(self, translations, days, layout='columns'):
+        if layout not in self.LAYOUTS:
+            raise ValueError(f"Неизвестная раскладка: {layout}")
+
+        self.translations = translations
+        self.layout = layout
+        self.aligned = {}
+        self.fragments = {}
+        self.errors = []
+
+        keys = []
+        for day_data in days.values():
+            for chapter_ref in day_data['chapters']:
+                parsed = parse_chapter_reference(chapter_ref)
+                if parsed and parsed not in self.aligned:
+                    self.aligned[parsed] = None
+                    keys.append(parsed)
+
+        # Главы каждого перевода извлекаются группами по исходным файлам, как в PlanChapters
+        stores = [self._split_translation(translation, keys) for translation in translations]
+
+        for key in keys:
+            rows = self._align([verses.get(key, {}) for verses in stores])
+            self.aligned[key] = rows
+            if rows:
+                self.fragments[key] = self._render(rows).encode('utf-8')
+
+    def _split_translation(self, translation, keys):
+        """Стихи всех глав плана в одном переводе: {(сокращение, глава): {номер стиха: html}}"""
+        needs = []
+        for book_abbr, chapter_num in keys:
+            matched_book = translation.books.get(book_abbr)
+            if not matched_book:
+                self.errors.append(f"{translation.name}: книга не найдена для сокращения {book_abbr}")
+            else:
+                needs.append(((book_abbr, chapter_num), matched_book, chapter_num))
+
+        chapters = {}
+        for key, chapter_div, error in translation.extractor.extract_chapters(needs):
+            if error:
+                self.errors.append(f"{translation.name}: {error}")
+            if chapter_div is not None:
+                chapters[key] = split_verses(chapter_div)
+        return chapters
+
+    def _align(self, stores):
+        """Выравнивает стихи главы по переводам: [(номер стиха, [html или None по переводам])]"""
+        if not any(stores):
+            return None
+
+        verse_nums = sorted(set().union(*stores))
+        return [(num, [verses.get(num) for verses in stores]) for num in verse_nums]
+
+    def _render(self, rows):
+        names = [html.escape(t.name) for t in self.translations]
+        parts = []
+
+        if self.layout == 'columns':
+            parts.append('<table class="parallel">')
+            parts.append('<tr>' + ''.join(f'<th>{name}</th>' for name in names) + '</tr>')
+            for _, cells in rows:
+                parts.append('<tr>' + ''.join(f'<td>{cell or ""}</td>' for cell in cells) + '</tr>')
+            parts.append('</table>')
+        else:
+            for _, cells in rows:
+                parts.append('<div class="parallel-verse">')
+                for name, cell in zip(names, cells):
+                    if cell:
+                        parts.append(f'<div class="translation">{name}</div>{cell}')
+                parts.append('</div>')
+
+        return '\n'.join(parts)
+
+    def render_chapter(self, book_abbr, chapter_num):
+        """Возвращает готовый html главы во всех переводах (bytes) или None, если ее нет ни в одном"""
+        return self.fragments.get((book_abbr, chapter_num))
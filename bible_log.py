@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Логирование генераторов: уровни, тихий режим, неблокирующий вывод и итоговая сводка
+
+Вызовы логгера в цикле рендеринга только кладут запись в очередь, а в консоль
+ее пишет отдельный поток (QueueHandler + QueueListener). Предупреждения идут
+через warn() с категорией, чтобы в конце выдать сводку в JSON.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+log = logging.getLogger('bible365')
+# Пока setup_logging не вызван (бенчмарк, регрессия, импорт из других скриптов), ничего не печатаем
+log.addHandler(logging.NullHandler())
+log.propagate = False
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+
+class RunStats:
+    """Счетчики прогона: собранные и пропущенные дни, предупреждения по категориям"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.days_built = 0
+        self.days_skipped = 0
+        self.warnings = {}
+
+    def as_dict(self):
+        return {
+            'days_built': self.days_built,
+            'days_skipped': self.days_skipped,
+            'warnings': sum(self.warnings.values()),
+            'warnings_by_category': dict(sorted(self.warnings.items())),
+        }
+
+
+STATS = RunStats()
+
+_listener = None
+
+
+def setup_logging(level='INFO', quiet=False, stream=None):
+    """Подключает вывод логгера через очередь и фоновый поток
+
+    quiet оставляет только ошибки; итоговая сводка печатается всегда (см. finish_logging).
+    """
+    global _listener
+    finish_logging(print_summary=False)
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    for old_handler in list(log.handlers):
+        log.removeHandler(old_handler)
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel('ERROR' if quiet else level)
+
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+
+
+def warn(category, message, *args):
+    """Предупреждение с категорией для сводки ('chapter_not_found', 'book_not_found', ...)"""
+    STATS.warnings[category] = STATS.warnings.get(category, 0) + 1
+    log.warning('  ! ' + message, *args)
+
+
+def finish_logging(print_summary=True, summary_path=None):
+    """Дописывает очередь, останавливает поток вывода и выдает сводку JSON
+
+    Сводка пишется в summary_path, если он задан, иначе последней строкой в stdout.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    if not print_summary:
+        return
+
+    summary = json.dumps(STATS.as_dict(), ensure_ascii=False)
+    if summary_path:
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(summary + '\n')
+    else:
+        print(summary)
+
+
+# Если прогон упадет, все равно допишем то, что уже в очереди; регистрируем один раз на процесс
+atexit.register(finish_logging, print_summary=False)
+
+
+def add_logging_args(parser):
+    """Общие аргументы логирования для обоих генераторов"""
+    parser.add_argument('--log-level', choices=LEVELS, default='INFO',
+                        help='Уровень логирования (DEBUG добавляет построчный прогресс по дням)')
+    parser.add_argument('--quiet', action='store_true',
+                        help='Тихий режим: только ошибки и итоговая сводка')
+    parser.add_argument('--summary', metavar='ФАЙЛ',
+                        help='Записать итоговую сводку JSON в файл вместо stdout')
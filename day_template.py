@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Скомпилированный шаблон страницы дня для обоих генераторов
+
+Неизменные части документа собираются в байты один раз, а рендеринг дня -
+это склейка этих байтов с названием дня и готовыми фрагментами глав.
+Результат кладется в EPUB как есть (epub.EpubItem), без повторного разбора ebooklib.
+Стили лежат отдельным файлом STYLE_FILE, одинаковым во всех EPUB.
+"""
+
+import html
+
+from ebooklib import epub
+
+DAY_STYLE = [
+    'body { font-family: serif; margin: 1em; }',
+    '.day-title { text-align: center; font-size: 1.8em; font-weight: bold; margin: 1em 0; }',
+    '.subtitle { text-align: center; font-size: 1em; color: #666; margin-bottom: 2em; }',
+    '.book-title { font-size: 1.3em; font-weight: bold; margin-top: 2em; margin-bottom: 0.5em; color: #333; }',
+    '.chapter-title { font-size: 1.1em; font-weight: bold; margin-top: 1em; margin-bottom: 0.5em; }',
+    '.verse { margin: 0.5em 0; text-indent: 1.5em; line-height: 1.6; }',
+    '.verse-num { font-weight: bold; font-style: normal; color: #666; }',
+    'table.parallel { width: 100%; border-collapse: collapse; }',
+    'table.parallel td, table.parallel th { vertical-align: top; padding: 0 0.5em; }',
+    '.translation { font-size: 0.8em; color: #666; margin-top: 0.5em; }',
+]
+
+STYLE_FILE = 'style/day.css'
+
+
+class DayTemplate:
+    """Страница дня: префикс до названия, середина до глав и суффикс - заранее готовые байты"""
+
+    def __init__(self, subtitle='Вся Библия за год', lang='ru'):
+        # Язык документа, как раньше выставлял EpubHtml(lang='ru'): по нему читалки выбирают переносы и шрифт
+        head = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<!DOCTYPE html>',
+            f'<html xmlns="http://www.w3.org/1999/xhtml" lang="{lang}" xml:lang="{lang}">',
+            '<head>',
+        ]
+        style = [f'<link rel="stylesheet" type="text/css" href="{STYLE_FILE}"/>', '</head>', '<body>']
+
+        self.before_title = ('\n'.join(head) + '\n<title>').encode('utf-8')
+        self.after_title = ('</title>\n' + '\n'.join(style) + '\n<div class="day-title">').encode('utf-8')
+        self.after_day_title = f'</div>\n<div class="subtitle">{html.escape(subtitle)}</div>'.encode('utf-8')
+        self.suffix = b'\n</body>\n</html>'
+
+    def render(self, day_name, fragments):
+        """Собирает документ дня из названия и списка байтовых фрагментов глав"""
+        title = html.escape(day_name).encode('utf-8')
+        parts = [self.before_title, title, self.after_title, title, self.after_day_title]
+        for fragment in fragments:
+            parts.append(b'\n')
+            parts.append(fragment)
+        parts.append(self.suffix)
+        return b''.join(parts)
+
+
+# Шаблон собирается один раз на процесс и используется обоими генераторами
+DAY_TEMPLATE = DayTemplate()
+
+
+def chapter_fragment(russian_name, chapter_num, chapter_html):
+    """Фрагмент главы: заголовок книги и главы + html главы (bytes)"""
+    heading = f'<div class="book-title">{russian_name}. Глава {chapter_num}</div>\n'.encode('utf-8')
+    return heading + chapter_html
+
+
+def day_item(file_name, content):
+    """Документ дня для EpubBook: EpubItem не разбирает содержимое, в отличие от EpubHtml"""
+    uid = file_name.rsplit('.', 1)[0]
+    return epub.EpubItem(uid=uid, file_name=file_name, media_type='application/xhtml+xml', content=content)
+
+
+def style_item():
+    """Общая таблица стилей страниц дня"""
+    content = ('\n'.join(DAY_STYLE) + '\n').encode('utf-8')
+    return epub.EpubItem(uid='style_day', file_name=STYLE_FILE, media_type='text/css', content=content)
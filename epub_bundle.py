@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Контентно-адресуемый бандл ежедневных EPUB: манифест и дедуплицированные блобы
+
+Каждый EPUB режется на отрезки по границам членов zip-архива. Сжатые данные
+членов дописываются в один файл blobs.pack, а манифест хранит для каждого sha256
+смещение и длину в нем, поэтому одинаковые mimetype, container.xml, таблица
+стилей и т.п. хранятся один раз на все 365 файлов. Один файл вместо файла на блоб:
+на диске ~1500 мелких блобов занимали бы по целому блоку ФС каждый.
+Заголовки zip в манифест не копируются: для каждого члена хранится короткая
+запись (имя, блоб, тип сжатия, CRC, размер, атрибуты), а заголовки собираются
+заново тем же кодом, что пишет EPUB (epub_writer.build_zip). Архивы, которые так
+не воспроизводятся байт в байт, хранятся по-старому - отрезками с заголовками в base64.
+Из бандла каждый EPUB восстанавливается байт в байт.
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import struct
+import zipfile
+
+from epub_writer import build_zip
+
+MANIFEST_NAME = 'manifest.json.gz'
+PACK_NAME = 'blobs.pack'
+
+# Длина фиксированной части локального заголовка zip и смещения длин имени/extra в ней
+LOCAL_HEADER_SIZE = 30
+LOCAL_HEADER_LENGTHS = struct.Struct('<HH')
+LOCAL_HEADER_LENGTHS_OFFSET = 26
+
+
+def member_spans(data):
+    """Члены zip в порядке следования: [(ZipInfo, начало сжатых данных, конец)]"""
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        infos = sorted(zf.infolist(), key=lambda info: info.header_offset)
+
+    spans = []
+    for info in infos:
+        name_len, extra_len = LOCAL_HEADER_LENGTHS.unpack_from(
+            data, info.header_offset + LOCAL_HEADER_LENGTHS_OFFSET)
+        data_start = info.header_offset + LOCAL_HEADER_SIZE + name_len + extra_len
+        spans.append((info, data_start, data_start + info.compress_size))
+    return spans
+
+
+def split_zip(data):
+    """Режет zip на отрезки: [('raw', байты) | ('blob', байты)], склейка дает исходный файл"""
+    segments = []
+    pos = 0
+    for info, data_start, data_end in member_spans(data):
+        # Всё между членами (например, data descriptor) сохраняем как есть
+        if info.header_offset > pos:
+            segments.append(('raw', data[pos:info.header_offset]))
+
+        segments.append(('raw', data[info.header_offset:data_start]))
+        segments.append(('blob', data[data_start:data_end]))
+        pos = data_end
+
+    # Центральный каталог и конец архива
+    segments.append(('raw', data[pos:]))
+    return segments
+
+
+class EpubBundle:
+    """Бандл в папке bundle_dir: manifest.json.gz + blobs.pack
+
+    Манифест: {'entries': {имя: запись}, 'blobs': {sha256: [смещение, длина]}}.
+    Новые блобы только дописываются в конец blobs.pack, а место от блобов без
+    ссылок освобождается при save() перезаписью файла.
+    """
+
+    def __init__(self, bundle_dir):
+        self.bundle_dir = bundle_dir
+        self.entries = {}
+        self.blobs = {}
+        self.stats = {'files': 0, 'input_bytes': 0, 'blobs_written': 0, 'blob_bytes_written': 0}
+
+        manifest_path = os.path.join(bundle_dir, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with gzip.open(manifest_path, 'rt', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.entries = manifest['entries']
+            self.blobs = manifest['blobs']
+
+    def _pack_path(self):
+        return os.path.join(self.bundle_dir, PACK_NAME)
+
+    def _store_blob(self, data):
+        """Дописывает блоб в blobs.pack, если такого еще нет, и возвращает его sha256"""
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in self.blobs:
+            os.makedirs(self.bundle_dir, exist_ok=True)
+            with open(self._pack_path(), 'ab') as f:
+                offset = f.tell()
+                f.write(data)
+            self.blobs[digest] = [offset, len(data)]
+            self.stats['blobs_written'] += 1
+            self.stats['blob_bytes_written'] += len(data)
+        return digest
+
+    def _read_blob(self, digest):
+        offset, length = self.blobs[digest]
+        with open(self._pack_path(), 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def add(self, epub_path, name=None):
+        """Добавляет EPUB в бандл под именем name (по умолчанию - имя файла)"""
+        with open(epub_path, 'rb') as f:
+            data = f.read()
+
+        entry = {'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+        entry.update(self._compact_entry(data) or self._segment_entry(data))
+
+        self.entries[name or os.path.basename(epub_path)] = entry
+        self.stats['files'] += 1
+        self.stats['input_bytes'] += len(data)
+
+    def _compact_entry(self, data):
+        """Записи членов для сборки заголовков заново или None, если архив так не воспроизводится"""
+        spans = member_spans(data)
+        if not spans:
+            return None
+
+        date_time = spans[0][0].date_time
+        members = [(info.filename, info.compress_type, info.CRC, info.file_size, data[data_start:data_end],
+                    info.create_system, info.external_attr) for info, data_start, data_end in spans]
+        if build_zip(members, date_time) != data:
+            return None
+
+        return {
+            'date_time': list(date_time),
+            'members': [[file_name, self._store_blob(payload), compress_type, crc, size, create_system, external_attr]
+                        for file_name, compress_type, crc, size, payload, create_system, external_attr in members],
+        }
+
+    def _segment_entry(self, data):
+        segments = []
+        for kind, chunk in split_zip(data):
+            if kind == 'blob':
+                segments.append({'blob': self._store_blob(chunk)})
+            elif chunk:
+                segments.append({'raw': base64.b64encode(chunk).decode('ascii')})
+        return {'segments': segments}
+
+    def save(self):
+        """Удаляет блобы, на которые манифест больше не ссылается, и записывает manifest.json.gz"""
+        os.makedirs(self.bundle_dir, exist_ok=True)
+        self.prune()
+        manifest = json.dumps({'version': 3, 'entries': self.entries, 'blobs': self.blobs},
+                              ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        # mtime=0, чтобы одинаковый манифест давал одинаковые байты
+        with open(os.path.join(self.bundle_dir, MANIFEST_NAME), 'wb') as f:
+            with gzip.GzipFile(fileobj=f, mode='wb', mtime=0) as gz:
+                gz.write(manifest.encode('utf-8'))
+
+    def prune(self):
+        """Убирает из blobs.pack блобы без ссылок (остаются после пересборки измененных дней)
+
+        Если мусора нет, файл не трогается; иначе живые блобы переписываются подряд
+        в новый файл, который заменяет старый, а смещения в self.blobs обновляются.
+        """
+        referenced = set()
+        for entry in self.entries.values():
+            referenced.update(member[1] for member in entry.get('members', ()))
+            referenced.update(segment['blob'] for segment in entry.get('segments', ()) if 'blob' in segment)
+
+        removed = len(self.blobs) - len(referenced & self.blobs.keys())
+        pack_path = self._pack_path()
+        pack_size = os.path.getsize(pack_path) if os.path.exists(pack_path) else 0
+        live_size = sum(self.blobs[digest][1] for digest in referenced if digest in self.blobs)
+        self.stats['blobs_removed'] = removed
+        if pack_size == live_size:
+            return removed
+
+        # Дописанное прерванным запуском тоже не попадает в манифест и уходит здесь
+        blobs = {}
+        tmp_path = pack_path + '.tmp'
+        with open(pack_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for digest, (offset, length) in sorted(self.blobs.items(), key=lambda item: item[1][0]):
+                if digest in referenced:
+                    src.seek(offset)
+                    blobs[digest] = [dst.tell(), length]
+                    dst.write(src.read(length))
+        os.replace(tmp_path, pack_path)
+        self.blobs = blobs
+        return removed
+
+    def reconstitute(self, name):
+        """Собирает EPUB из манифеста и блобов, проверяя sha256 результата"""
+        entry = self.entries[name]
+        if 'members' in entry:
+            members = [(file_name, compress_type, crc, size, self._read_blob(digest), create_system, external_attr)
+                       for file_name, digest, compress_type, crc, size, create_system, external_attr
+                       in entry['members']]
+            data = build_zip(members, tuple(entry['date_time']))
+        else:
+            data = b''.join(self._read_blob(segment['blob']) if 'blob' in segment
+                            else base64.b64decode(segment['raw'])
+                            for segment in entry['segments'])
+
+        if hashlib.sha256(data).hexdigest() != entry['sha256']:
+            raise ValueError(f"Контрольная сумма не совпала при сборке {name}")
+        return data
+
+    def restore(self, output_dir):
+        """Восстанавливает все EPUB бандла в output_dir"""
+        os.makedirs(output_dir, exist_ok=True)
+        for name in sorted(self.entries):
+            with open(os.path.join(output_dir, name), 'wb') as f:
+                f.write(self.reconstitute(name))
+        return len(self.entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Упаковка ежедневных EPUB в дедуплицированный бандл и обратно')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pack = subparsers.add_parser('pack', help='Добавить EPUB файлы в бандл')
+    pack.add_argument('bundle_dir')
+    pack.add_argument('epubs', nargs='+')
+
+    restore = subparsers.add_parser('restore', help='Восстановить EPUB файлы из бандла')
+    restore.add_argument('bundle_dir')
+    restore.add_argument('output_dir')
+
+    args = parser.parse_args()
+    bundle = EpubBundle(args.bundle_dir)
+
+    if args.command == 'pack':
+        for epub_path in args.epubs:
+            bundle.add(epub_path)
+        bundle.save()
+        stats = bundle.stats
+        print(f"✓ Добавлено {stats['files']} файлов ({stats['input_bytes']} байт), "
+              f"новых блобов: {stats['blobs_written']} ({stats['blob_bytes_written']} байт), "
+              f"удалено старых: {stats['blobs_removed']}")
+    else:
+        count = bundle.restore(args.output_dir)
+        print(f"✓ Восстановлено {count} файлов в {args.output_dir}/")
+
+
+if __name__ == '__main__':
+    main()
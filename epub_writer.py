@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Запись EPUB с настраиваемым сжатием
+
+Режимы: 'store' (без сжатия), 'deflate:N' (N от 0 до 9, по умолчанию 6 - как в ebooklib)
+и 'zopfli' (максимальное сжатие). zopfli - необязательная зависимость: pip install zopfli;
+без нее режим zopfli заменяется на deflate:9.
+
+Вывод детерминированный: dcterms:modified и время членов zip берутся из BUILD_TIME,
+так что одинаковое содержимое дает одинаковые байты при любой пересборке.
+"""
+
+import datetime
+import io
+import os
+import struct
+import sys
+import zipfile
+import zlib
+
+from ebooklib import epub
+
+try:
+    import zopfli.zlib
+except ImportError:
+    zopfli = None
+
+COMPRESSION_DEFAULT = 'deflate:6'
+
+# Время сборки для dcterms:modified и заголовков zip; SOURCE_DATE_EPOCH - общепринятый способ его задать
+BUILD_TIME = datetime.datetime.fromtimestamp(int(os.environ.get('SOURCE_DATE_EPOCH', 1704067200)),
+                                             datetime.timezone.utc)
+ZIP_DATE_TIME = BUILD_TIME.timetuple()[:6]
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+END_OF_CENTRAL_DIR = struct.Struct('<IHHHHIIH')
+
+
+def parse_compression(spec):
+    """Разбирает режим сжатия в пару (метод, уровень)"""
+    method, _, level = spec.partition(':')
+
+    if method == 'store' and not level:
+        return ('store', None)
+
+    if method == 'deflate':
+        if not level:
+            return ('deflate', 6)
+        if level.isdigit() and 0 <= int(level) <= 9:
+            return ('deflate', int(level))
+
+    if method == 'zopfli' and not level:
+        if zopfli is None:
+            # stderr: разбор аргументов идет и перед --check, чей JSON в stdout должен остаться чистым
+            print("  ! Пакет zopfli не установлен (pip install zopfli), вместо него используется deflate:9",
+                  file=sys.stderr)
+            return ('deflate', 9)
+        return ('zopfli', None)
+
+    raise ValueError(f"Неизвестный режим сжатия: {spec} (ожидается store, deflate[:0-9] или zopfli)")
+
+
+def write_epub(output_path, book, compression=('deflate', 6)):
+    """Сохраняет EpubBook в файл с заданным сжатием, возвращает результат ebooklib"""
+    method, level = compression
+
+    # ebooklib пишет в память как можно быстрее, сжатие и фиксированное время проставляет repack_zip;
+    # на диск попадает только готовый архив
+    options = {'epub3_pages': False, 'compresslevel': 0, 'mtime': BUILD_TIME}
+    buffer = io.BytesIO()
+    result = epub.write_epub(buffer, book, options)
+
+    if result:
+        data = repack_zip(buffer.getvalue(), method, level)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+    return result
+
+
+def _dos_datetime(date_time):
+    year, month, day, hour, minute, second = date_time
+    dos_time = (hour << 11) | (minute << 5) | (second // 2)
+    dos_date = ((year - 1980) << 9) | (month << 5) | day
+    return dos_time, dos_date
+
+
+def compress_member(data, method, level=None):
+    """Сжимает данные члена zip: (тип сжатия zip, сжатые данные)"""
+    if method == 'zopfli':
+        # zopfli отдает zlib-контейнер: 2 байта заголовка и 4 байта adler32 в конце
+        return zipfile.ZIP_DEFLATED, zopfli.zlib.compress(data)[2:-4]
+    if method == 'deflate':
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        return zipfile.ZIP_DEFLATED, compressor.compress(data) + compressor.flush()
+    return zipfile.ZIP_STORED, data
+
+
+def build_zip(members, date_time=ZIP_DATE_TIME):
+    """Собирает zip из готовых членов: [(имя, тип сжатия, crc, размер, сжатые данные, create_system, external_attr)]
+
+    zipfile не умеет писать чужой deflate-поток, поэтому заголовки собираем сами.
+    Тот же код восстанавливает архивы из бандла (epub_bundle), поэтому формат заголовков один.
+    """
+    dos_time, dos_date = _dos_datetime(date_time)
+    out = bytearray()
+    central = bytearray()
+
+    for file_name, compress_type, crc, size, payload, create_system, external_attr in members:
+        name = file_name.encode('utf-8')
+        flags = 0 if name.isascii() else 0x800
+        offset = len(out)
+
+        out += LOCAL_HEADER.pack(0x04034b50, 20, flags, compress_type, dos_time, dos_date,
+                                 crc, len(payload), size, len(name), 0)
+        out += name
+        out += payload
+
+        central += CENTRAL_HEADER.pack(0x02014b50, (create_system << 8) | 20, 20, flags,
+                                       compress_type, dos_time, dos_date, crc, len(payload), size,
+                                       len(name), 0, 0, 0, 0, external_attr, offset)
+        central += name
+
+    central_offset = len(out)
+    out += central
+    out += END_OF_CENTRAL_DIR.pack(0x06054b50, 0, 0, len(members), len(members),
+                                   len(central), central_offset, 0)
+    return bytes(out)
+
+
+def repack_zip(data, method, level=None):
+    """Пересжимает все члены zip выбранным методом, сохраняя порядок, с фиксированным временем
+
+    Принимает и возвращает байты архива. mimetype по требованию EPUB всегда остается без сжатия.
+    """
+    members = []
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        for info in zf.infolist():
+            content = zf.read(info)
+            member_method = 'store' if info.filename == 'mimetype' else method
+            compress_type, payload = compress_member(content, member_method, level)
+            members.append((info.filename, compress_type, info.CRC, len(content), payload,
+                            info.create_system, info.external_attr))
+
+    return build_zip(members)
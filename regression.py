@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Регрессионная проверка сгенерированных EPUB по эталону
+
+Из каждого дня берется текст по главам (между заголовками div.book-title),
+пробелы нормализуются, от текста считается sha256. Эталон хранит эти хэши
+и размеры файлов; сравнение показывает расхождения текста, разницу размеров
+и время генерации каждого дня.
+
+    python regression.py record                       # эталон из daily_epubs/ и полного года
+    python regression.py compare                      # сгенерировать дни и полный год и сравнить с эталоном
+    python regression.py compare --daily daily_epubs --full-year Библия_365_Полный_год.epub
+                                                      # сравнить уже готовые файлы
+
+Эталон записывается только с файлов, лежащих в репозитории: изменения текста
+коммитятся вместе с перегенерированными EPUB и новым эталоном.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+
+from lxml import etree
+
+BASELINE_PATH = os.path.join('golden', 'baseline.json')
+FULL_YEAR_FILE = 'Библия_365_Полный_год.epub'
+DAY_DOCUMENT = re.compile(r'(?:^|/)(day_\d{3})\.xhtml$')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def chapter_hashes(document):
+    """Делит документ дня на главы по div.book-title: [[заголовок, sha256 текста главы], ...]"""
+    root = etree.fromstring(document, etree.HTMLParser(encoding='utf-8'))
+    body = root.find('body')
+    if body is None:
+        return []
+
+    chapters = []
+    heading = None
+    texts = []
+
+    def flush():
+        if heading is not None:
+            digest = hashlib.sha256(normalize_text(''.join(texts)).encode('utf-8')).hexdigest()
+            chapters.append([heading, digest[:16]])
+
+    # Текст до первого заголовка (название дня, подзаголовок) в сравнение не входит
+    for node in body:
+        if node.tag == 'div' and 'book-title' in (node.get('class') or ''):
+            flush()
+            heading = normalize_text(''.join(node.itertext()))
+            texts = []
+        elif heading is not None:
+            texts.append(''.join(node.itertext()))
+            texts.append(node.tail or '')
+    flush()
+
+    return chapters
+
+
+def epub_days(epub_path):
+    """Возвращает {ключ дня: главы} для ежедневного (один документ) или годового EPUB"""
+    days = {}
+    with zipfile.ZipFile(epub_path) as zf:
+        names = zf.namelist()
+        day_documents = [name for name in names if DAY_DOCUMENT.search(name)]
+
+        if day_documents:
+            for name in day_documents:
+                days[DAY_DOCUMENT.search(name).group(1)] = chapter_hashes(zf.read(name))
+        else:
+            key = os.path.splitext(os.path.basename(epub_path))[0]
+            content = next(name for name in names if name.endswith('content.xhtml'))
+            days[key] = chapter_hashes(zf.read(content))
+
+    return days
+
+
+def collect(daily_dir=None, full_year=None):
+    """Снимок для эталона: главы по дням и размеры файлов"""
+    snapshot = {'days': {}, 'full_year': {}, 'sizes': {}}
+
+    if daily_dir:
+        for name in sorted(os.listdir(daily_dir)):
+            if name.startswith('day_') and name.endswith('.epub'):
+                path = os.path.join(daily_dir, name)
+                snapshot['days'].update(epub_days(path))
+                snapshot['sizes'][name] = os.path.getsize(path)
+
+    if full_year and os.path.exists(full_year):
+        snapshot['full_year'] = epub_days(full_year)
+        snapshot['sizes'][os.path.basename(full_year)] = os.path.getsize(full_year)
+
+    return snapshot
+
+
+def build_daily(output_dir, source, compression, limit=None):
+    """Генерирует ежедневные EPUB, возвращает {ключ дня: секунды}"""
+    from bible_common import BibleEpubExtractor, parse_days_file
+    from epub_writer import parse_compression
+    from generate_daily_epubs_v3 import create_daily_epub
+
+    days = sorted(parse_days_file('days').items(), key=lambda x: x[1]['number'])[:limit]
+
+    timings = {}
+    with BibleEpubExtractor(source) as extractor:
+        # Логирование генератора здесь не настроено, так что консольного вывода в замере нет
+        for day_name, day_data in days:
+            start = time.perf_counter()
+            create_daily_epub(day_name, day_data, extractor, output_dir,
+                              compression=parse_compression(compression))
+            timings[f"day_{day_data['number']:03d}"] = time.perf_counter() - start
+
+    return timings
+
+
+def build_full_year(output_file, source, compression, limit=None):
+    """Генерирует годовой EPUB, возвращает секунды"""
+    from bible_common import BibleEpubExtractor, parse_days_file
+    from epub_writer import parse_compression
+    from generate_full_year_epub import create_full_year_epub
+
+    days = dict(sorted(parse_days_file('days').items(), key=lambda x: x[1]['number'])[:limit])
+
+    with BibleEpubExtractor(source) as extractor:
+        start = time.perf_counter()
+        create_full_year_epub(days, extractor, output_file, compression=parse_compression(compression))
+        return time.perf_counter() - start
+
+
+def compare_chapters(expected, actual):
+    """Список расхождений текста: (день, описание)"""
+    problems = []
+    for day_key in sorted(set(expected) | set(actual)):
+        if day_key not in actual:
+            problems.append((day_key, 'день отсутствует'))
+            continue
+        if day_key not in expected:
+            problems.append((day_key, 'дня нет в эталоне'))
+            continue
+
+        expected_chapters = dict(expected[day_key])
+        actual_chapters = dict(actual[day_key])
+        headings = list(expected_chapters) + [h for h in actual_chapters if h not in expected_chapters]
+        for heading in headings:
+            if heading not in actual_chapters:
+                problems.append((day_key, f'нет главы "{heading}"'))
+            elif heading not in expected_chapters:
+                problems.append((day_key, f'лишняя глава "{heading}"'))
+            elif expected_chapters[heading] != actual_chapters[heading]:
+                problems.append((day_key, f'текст главы "{heading}" изменился'))
+
+    return problems
+
+
+def report_sizes(expected_sizes, actual_sizes):
+    common = sorted(set(expected_sizes) & set(actual_sizes))
+    if not common:
+        return
+
+    expected_total = sum(expected_sizes[name] for name in common)
+    actual_total = sum(actual_sizes[name] for name in common)
+    delta = actual_total - expected_total
+    print(f"Размер: {actual_total} байт против {expected_total} в эталоне "
+          f"({delta:+d}, {delta / expected_total * 100:+.1f}%) по {len(common)} файлам")
+
+    deltas = sorted(((actual_sizes[name] - expected_sizes[name], name) for name in common),
+                    key=lambda x: abs(x[0]), reverse=True)
+    for size_delta, name in deltas[:5]:
+        if size_delta:
+            print(f"  {name}: {size_delta:+d} байт")
+
+
+def report_timings(timings):
+    if not timings:
+        return
+
+    total = sum(timings.values())
+    print(f"Время: {total:.2f} с на {len(timings)} дней, в среднем {total / len(timings) * 1000:.1f} мс/день")
+    for day_key, seconds in sorted(timings.items(), key=lambda x: x[1], reverse=True)[:5]:
+        print(f"  {day_key}: {seconds * 1000:.1f} мс")
+
+
+def cmd_record(args):
+    snapshot = collect(args.daily, args.full_year)
+    os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+    with open(args.baseline, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=1, sort_keys=True)
+    print(f"✓ Эталон записан: {args.baseline} ({len(snapshot['days'])} дней, "
+          f"{len(snapshot['full_year'])} дней полного года)")
+    return 0
+
+
+def cmd_compare(args):
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    timings = {}
+    full_year_time = None
+    with tempfile.TemporaryDirectory() as build_dir:
+        daily_dir = args.daily
+        full_year = args.full_year
+        if daily_dir is None:
+            daily_dir = os.path.join(build_dir, 'daily')
+            os.makedirs(daily_dir)
+            timings = build_daily(daily_dir, args.source, args.compression, args.days)
+            if full_year is None:
+                full_year = os.path.join(build_dir, FULL_YEAR_FILE)
+                full_year_time = build_full_year(full_year, args.source, args.compression, args.days)
+
+        actual = collect(daily_dir, full_year)
+
+    expected_days = baseline['days']
+    expected_full_year = baseline['full_year']
+    if args.days:
+        expected_days = {key: value for key, value in expected_days.items() if key in actual['days']}
+        expected_full_year = {key: value for key, value in expected_full_year.items()
+                              if key in actual['full_year']}
+        # Годовой файл из части дней с эталонным по размеру не сравнить
+        actual['sizes'].pop(os.path.basename(full_year or ''), None)
+
+    problems = compare_chapters(expected_days, actual['days'])
+    if actual['full_year']:
+        problems += [(f"полный год {day}", text)
+                     for day, text in compare_chapters(expected_full_year, actual['full_year'])]
+
+    report_sizes(baseline['sizes'], actual['sizes'])
+    report_timings(timings)
+    if full_year_time is not None:
+        print(f"Полный год: {full_year_time:.2f} с")
+
+    if problems:
+        print(f"\n✗ Расхождений текста: {len(problems)}")
+        for day_key, text in problems:
+            print(f"  ! {day_key}: {text}")
+        return 1
+
+    print(f"\n✓ Текст совпадает с эталоном ({len(actual['days'])} дней)")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение сгенерированных EPUB с эталоном')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Файл эталона')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record = subparsers.add_parser('record', help='Записать эталон по готовым EPUB')
+    record.add_argument('--daily', default='daily_epubs', help='Папка с ежедневными EPUB')
+    record.add_argument('--full-year', default=FULL_YEAR_FILE, help='Годовой EPUB')
+
+    compare = subparsers.add_parser('compare', help='Сравнить с эталоном')
+    compare.add_argument('--daily', help='Папка с готовыми ежедневными EPUB (по умолчанию генерируются заново)')
+    compare.add_argument('--full-year', help='Готовый годовой EPUB (по умолчанию генерируется вместе с днями)')
+    compare.add_argument('--source', default='.', help='Исходная книга для генерации: папка или файл .epub')
+    compare.add_argument('--compression', default='deflate:6', help='Сжатие при генерации')
+    compare.add_argument('--days', type=int, help='Сгенерировать и сравнить только первые N дней')
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        return cmd_record(args)
+    return cmd_compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())